@@ -101,7 +101,7 @@ run_test() {
     echo "------------------------------------------------------------" >> "$RESULTS_FILE"
 
     # Run the test and capture output
-    if "$UV_BIN" run python "$STRESS_TEST_DIR/stress_test.py" --program "$program" --duration "$DURATION" $extra_args 2>&1 | tee -a "$RESULTS_FILE"; then
+    if "$UV_BIN" run python "$STRESS_TEST_DIR/stress_test.py" --program "$program" --duration "$DURATION" --detailed-memory $extra_args 2>&1 | tee -a "$RESULTS_FILE"; then
         echo "✓ Test completed"
     else
         echo "✗ Test failed"
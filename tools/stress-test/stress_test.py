@@ -8,10 +8,12 @@ concurrently to measure CPU and memory usage under load.
 
 import argparse
 import os
-import subprocess
+import selectors
+import socket
 import sys
 import threading
 import time
+from collections import deque
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Callable
@@ -27,16 +29,26 @@ MULTICAST_BASE = "239.81.0"  # /24 subnet
 MULTICAST_PORT = 4056
 MULTICAST_START_HOST = 1  # Start from .1 (e.g., 239.81.0.1)
 
+# How long to wait for the server to accept connections, and the longest pause between attempts
+SERVER_START_TIMEOUT = 5.0
+SERVER_POLL_MAX_DELAY = 0.05
+
+# Clients per curl process (curl caps --parallel-max at 300)
+CURL_MAX_PARALLEL = 256
+
+
+# One URL per usable host address; client indexes wrap around, skipping .0 and .255
+_STREAM_URLS = tuple(
+    f"rtp/{MULTICAST_BASE}.{(MULTICAST_START_HOST + i - 1) % 254 + 1}:{MULTICAST_PORT}" for i in range(254)
+)
+
 
 def get_stream_url(client_index: int) -> str:
-    """Generate stream URL for a specific client.
+    """Get the stream URL for a specific client.
 
     Each client gets a unique multicast address in the same /24 subnet.
     """
-    host = MULTICAST_START_HOST + client_index
-    if host > 254:
-        host = ((host - 1) % 254) + 1  # Wrap around, skip .0 and .255
-    return f"rtp/{MULTICAST_BASE}.{host}:{MULTICAST_PORT}"
+    return _STREAM_URLS[client_index % 254]
 
 
 # Program configurations with relative paths (relative to project root)
@@ -44,117 +56,132 @@ PROGRAM_CONFIGS: dict[str, dict] = {
     "rtp2httpd": {
         "binary": "build/rtp2httpd",
         "port": 5140,
-        # Args builder: receives (binary_path, m3u_file, port, config_path) -> list of args
-        "build_args": lambda binary, m3u, port, config: [
-            str(binary),
-            "-M",
-            f"file://{m3u}",
-            "-l",
-            str(port),
-            "-v",
-            "1",
-            "-m",
-            "999",
-        ],
     },
     "msd_lite": {
         "binary": "../msd_lite/build/src/msd_lite",
         "port": 7088,
         "config": "tools/stress-test/conf/msd_lite.conf",
-        "build_args": lambda binary, m3u, port, config: [
-            str(binary),
-            "-c",
-            str(config),
-        ],
     },
     "udpxy": {
         "binary": "../udpxy/chipmunk/udpxy",
         "port": 4022,
-        "build_args": lambda binary, m3u, port, config: [
-            str(binary),
-            "-T",  # Run in foreground
-            "-p",
-            str(port),
-            "-c",
-            "999",  # Max clients
-        ],
     },
     "tvgate": {
         "binary": "../tvgate/TVGate-linux-arm64",
         "port": 8888,
         "config": "tools/stress-test/conf/tvgate-config.yaml",
-        "build_args": lambda binary, m3u, port, config: [
-            str(binary),
-            "-config",
-            str(config),
-        ],
     },
 }
 
 
+def build_server_args(program: str, binary: Path, m3u: Path, port: int, config: Path | None) -> list[str]:
+    """Build the command line for the program under test."""
+    match program:
+        case "rtp2httpd":
+            return [str(binary), "-M", f"file://{m3u}", "-l", str(port), "-v", "1", "-m", "999"]
+        case "msd_lite":
+            return [str(binary), "-c", str(config)]
+        case "udpxy":
+            # -T: run in foreground, -c: max clients
+            return [str(binary), "-T", "-p", str(port), "-c", "999"]
+        case "tvgate":
+            return [str(binary), "-config", str(config)]
+        case _:
+            raise ValueError(f"Unknown program: {program}")
+
+
 # =============================================================================
 # Process Statistics
 # =============================================================================
 
 
-@dataclass
+@dataclass(slots=True)
+class SampleStats:
+    """Running count, sum and maximum of a series of samples."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass(slots=True)
 class ProcessStats:
     """CPU and memory statistics for a process."""
 
     pid: int
     name: str
-    cpu_samples: list[float] = field(default_factory=list)
-    pss_samples: list[float] = field(default_factory=list)  # Proportional Set Size (MB)
-    uss_samples: list[float] = field(default_factory=list)  # Unique Set Size (MB)
+    cpu: SampleStats = field(default_factory=SampleStats)  # CPU usage (%)
+    pss: SampleStats = field(default_factory=SampleStats)  # Proportional Set Size (MB)
+    uss: SampleStats = field(default_factory=SampleStats)  # Unique Set Size (MB)
+    rss: SampleStats = field(default_factory=SampleStats)  # Resident Set Size (MB)
 
-    @property
-    def cpu_avg(self) -> float:
-        return sum(self.cpu_samples) / len(self.cpu_samples) if self.cpu_samples else 0.0
 
-    @property
-    def cpu_max(self) -> float:
-        return max(self.cpu_samples) if self.cpu_samples else 0.0
+PROC_READ_SIZE = 4096
 
-    @property
-    def pss_avg(self) -> float:
-        return sum(self.pss_samples) / len(self.pss_samples) if self.pss_samples else 0.0
 
-    @property
-    def pss_max(self) -> float:
-        return max(self.pss_samples) if self.pss_samples else 0.0
+class ProcFileCache:
+    """Keeps /proc files open across monitor ticks and re-reads them with pread.
 
-    @property
-    def uss_avg(self) -> float:
-        return sum(self.uss_samples) / len(self.uss_samples) if self.uss_samples else 0.0
+    Reading an open procfs file from offset 0 regenerates its contents, so a
+    tick costs one pread per file instead of a path walk, open, read and
+    close. Files that were not read since the last prune() are closed, so
+    descriptors of exited processes do not accumulate.
+    """
 
-    @property
-    def uss_max(self) -> float:
-        return max(self.uss_samples) if self.uss_samples else 0.0
+    def __init__(self):
+        self._fds: dict[str, int] = {}
+        self._used: set[str] = set()
 
+    def read(self, path: str) -> bytes | None:
+        """Return the current contents of a /proc file, or None if it is gone."""
+        fd = self._fds.get(path)
+        if fd is None:
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            except OSError:
+                return None
+            self._fds[path] = fd
+        self._used.add(path)
 
-def get_child_pids(pid: int) -> list[int]:
-    """Get all child PIDs of a process (recursively)."""
-    children = []
-    try:
-        # Read /proc/[pid]/task/[tid]/children for each thread
-        task_dir = Path(f"/proc/{pid}/task")
-        if task_dir.exists():
-            for tid_dir in task_dir.iterdir():
-                children_file = tid_dir / "children"
-                if children_file.exists():
-                    content = children_file.read_text().strip()
-                    if content:
-                        for child_pid in content.split():
-                            child = int(child_pid)
-                            children.append(child)
-                            # Recursively get grandchildren
-                            children.extend(get_child_pids(child))
-    except FileNotFoundError, PermissionError, ValueError:
-        pass
-    return children
-
-
-@dataclass
+        try:
+            data = os.pread(fd, PROC_READ_SIZE, 0)
+            # Rarely needed: only long children lists exceed one read
+            while len(data) % PROC_READ_SIZE == 0 and data:
+                chunk = os.pread(fd, PROC_READ_SIZE, len(data))
+                if not chunk:
+                    break
+                data += chunk
+        except OSError:
+            # ESRCH once the process has exited
+            del self._fds[path]
+            os.close(fd)
+            return None
+        return data
+
+    def prune(self) -> None:
+        """Close files that were not read since the previous prune()."""
+        for path in self._fds.keys() - self._used:
+            os.close(self._fds.pop(path))
+        self._used.clear()
+
+    def close(self) -> None:
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        self._used.clear()
+
+
+@dataclass(slots=True)
 class MemoryInfo:
     """Memory information for a process."""
 
@@ -163,8 +190,18 @@ class MemoryInfo:
     rss: float = 0.0  # Resident Set Size (MB) - includes all shared
 
 
-def get_process_memory(pid: int) -> MemoryInfo | None:
-    """Get detailed memory info (PSS, USS, RSS) for a process.
+def get_smaps_kb(smaps: bytes, key: bytes) -> int:
+    """Get the kB value of a "\nKey:" line in smaps_rollup contents, or 0 if absent."""
+    start = smaps.find(key)
+    if start < 0:
+        return 0
+    start += len(key)
+    # int() skips the padding around the number
+    return int(smaps[start : smaps.index(b"kB", start)])
+
+
+def get_smaps_memory(smaps: bytes) -> MemoryInfo | None:
+    """Get detailed memory info (PSS, USS, RSS) from /proc/[pid]/smaps_rollup contents.
 
     - PSS: Proportional Set Size - shared memory divided proportionally
     - USS: Unique Set Size = Private_Clean + Private_Dirty (private memory only)
@@ -173,174 +210,243 @@ def get_process_memory(pid: int) -> MemoryInfo | None:
     For fork'd processes, PSS is most accurate for total usage estimation,
     while USS represents memory that would be freed if process terminates.
     """
+    # Every field line follows the "[rollup]" header line, so a leading
+    # newline anchors each key ("\nPss:" does not match "Pss_Dirty:")
     try:
-        smaps_path = Path(f"/proc/{pid}/smaps_rollup")
-        if not smaps_path.exists():
-            return None
-
-        content = smaps_path.read_text()
-        pss_kb = 0
-        private_clean_kb = 0
-        private_dirty_kb = 0
-        rss_kb = 0
-
-        for line in content.splitlines():
-            parts = line.split()
-            if len(parts) >= 2:
-                key = parts[0].rstrip(":")
-                value = int(parts[1])
-                if key == "Pss":
-                    pss_kb = value
-                elif key == "Private_Clean":
-                    private_clean_kb = value
-                elif key == "Private_Dirty":
-                    private_dirty_kb = value
-                elif key == "Rss":
-                    rss_kb = value
-
-        uss_kb = private_clean_kb + private_dirty_kb
-
-        return MemoryInfo(
-            pss=pss_kb / 1024.0,
-            uss=uss_kb / 1024.0,
-            rss=rss_kb / 1024.0,
-        )
-    except FileNotFoundError, PermissionError, ValueError, IndexError:
+        pss_kb = get_smaps_kb(smaps, b"\nPss:")
+        uss_kb = get_smaps_kb(smaps, b"\nPrivate_Clean:") + get_smaps_kb(smaps, b"\nPrivate_Dirty:")
+        rss_kb = get_smaps_kb(smaps, b"\nRss:")
+    except ValueError:
         return None
 
+    return MemoryInfo(
+        pss=pss_kb / 1024.0,
+        uss=uss_kb / 1024.0,
+        rss=rss_kb / 1024.0,
+    )
+
 
-def get_process_rss(pid: int) -> float | None:
-    """Get RSS (Resident Set Size) in MB for a process (fallback)."""
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def get_statm_rss(statm: bytes) -> float | None:
+    """Get RSS (Resident Set Size) in MB from /proc/[pid]/statm contents."""
     try:
-        with open(f"/proc/{pid}/statm", "r") as f:
-            statm = f.read().split()
-            rss_pages = int(statm[1])
-            page_size = os.sysconf("SC_PAGE_SIZE")
-            return (rss_pages * page_size) / (1024 * 1024)
-    except FileNotFoundError, ProcessLookupError, IndexError:
+        rss_pages = int(statm.split()[1])
+        return (rss_pages * PAGE_SIZE) / (1024 * 1024)
+    except ValueError, IndexError:
         return None
 
 
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# The monitor interval grows with the number of sampled processes, so a large
+# run is not perturbed by the monitor itself: one base interval per 32
+# processes, kept within 0.25-5s
+MONITOR_PROCS_PER_INTERVAL = 32
+MONITOR_MIN_INTERVAL = 0.25
+MONITOR_MAX_INTERVAL = 5.0
+
+
+def get_cpu_ticks(stat: bytes) -> int:
+    """Get utime + stime in clock ticks from /proc/[pid]/stat contents."""
+    # comm (field 2) may contain spaces and parentheses, so count fields from
+    # the last ")": utime and stime are fields 14 and 15
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    return int(fields[11]) + int(fields[12])
+
+
+def get_num_threads(stat: bytes) -> int:
+    """Get the thread count (field 20) from /proc/[pid]/stat contents."""
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    return int(fields[17])
+
+
 class ResourceMonitor(threading.Thread):
     """Thread that monitors CPU and memory usage of processes.
 
-    Uses top for CPU measurement (more accurate, especially for io_uring programs)
-    and /proc for memory measurement.
+    CPU usage is computed from utime/stime deltas in /proc/[pid]/stat between
+    ticks. These cover every thread of a process, including io_uring workers
+    on Linux 5.12+. Memory is RSS from /proc/[pid]/statm, which the kernel
+    keeps as counters. With detailed_memory, PSS and USS are read from
+    /proc/[pid]/smaps_rollup instead, which walks the page tables of the
+    measured process on every sample.
     """
 
-    def __init__(self, pids: dict[int, str], interval: float = 1.0):
+    def __init__(self, pids: dict[int, str], interval: float = 1.0, detailed_memory: bool = False):
         super().__init__(daemon=True)
         self.pids = pids  # {pid: name}
         self.interval = interval
+        self.detailed_memory = detailed_memory
         self.running = True
+        self._wakeup = threading.Event()  # Set by stop() to cut a long interval short
         self.stats: dict[int, ProcessStats] = {pid: ProcessStats(pid=pid, name=name) for pid, name in pids.items()}
-
-    def _get_cpu_via_top(self, pids: list[int]) -> dict[int, float]:
-        """Get CPU percentage for multiple PIDs using top.
-
-        Uses -n 2 because the first sample from top is cumulative since process
-        start, while the second sample shows actual CPU usage during the interval.
+        self._proc_files = ProcFileCache()
+        # {pid: (utime + stime ticks, monotonic time)} for the previous and current tick
+        self._prev_cpu_ticks: dict[int, tuple[int, float]] = {}
+        self._cpu_ticks: dict[int, tuple[int, float]] = {}
+        # /proc/[pid]/stat contents of the current tick, shared by the tree walk and CPU sampling
+        self._stats: dict[int, bytes | None] = {}
+
+    def _read_stat(self, pid: int) -> bytes | None:
+        if pid not in self._stats:
+            self._stats[pid] = self._proc_files.read(f"/proc/{pid}/stat")
+        return self._stats[pid]
+
+    def _get_child_pids(self, pid: int) -> list[int]:
+        """Get all descendant PIDs of a process, breadth first.
+
+        Each thread has its own /proc/[pid]/task/[tid]/children list; those
+        files stay open across ticks in the ProcFileCache. Single-threaded
+        processes, such as curl, only have the main thread's list, so the
+        task directory is listed only for multi-threaded ones.
         """
-        result: dict[int, float] = {}
-        if not pids:
-            return result
-
-        try:
-            # Run top for all PIDs at once
-            # -n 2: two samples (first is cumulative, second is accurate)
-            # -d 0.5: 0.5 second delay between samples
-            pid_str = ",".join(str(p) for p in pids)
-            proc = subprocess.run(
-                ["top", "-b", "-n", "2", "-d", "0.5", "-p", pid_str],
-                capture_output=True,
-                text=True,
-                timeout=10,
-            )
-            if proc.returncode != 0:
-                return result
-
-            # Parse top output - we want the LAST occurrence of each PID
-            # (which is from the second sample)
-            for line in proc.stdout.splitlines():
-                parts = line.split()
-                if len(parts) >= 9 and parts[0].isdigit():
-                    try:
-                        pid = int(parts[0])
-                        if pid in pids:
-                            # CPU% is typically in column 9 (0-indexed: 8)
-                            cpu_str = parts[8].replace(",", ".")
-                            result[pid] = float(cpu_str)
-                    except ValueError, IndexError:
-                        continue
-        except subprocess.TimeoutExpired:
-            pass
-        return result
+        children = []
+        queue = deque([pid])
+        while queue:
+            parent = queue.popleft()
+            stat = self._read_stat(parent)
+            if stat is None:
+                continue
+            try:
+                single_threaded = get_num_threads(stat) == 1
+            except ValueError, IndexError:
+                single_threaded = False
+            if single_threaded:
+                tids = [parent]
+            else:
+                try:
+                    with os.scandir(f"/proc/{parent}/task") as entries:
+                        tids = [entry.name for entry in entries if entry.name.isdigit()]
+                except FileNotFoundError, PermissionError:
+                    continue
+            for tid in tids:
+                content = self._proc_files.read(f"/proc/{parent}/task/{tid}/children")
+                if content:
+                    for child_pid in content.split():
+                        child = int(child_pid)
+                        children.append(child)
+                        queue.append(child)
+        return children
+
+    def _get_cpu_with_children(self, all_pids: list[int]) -> float | None:
+        """Get aggregated CPU percentage for a process and all its children.
+
+        Usage is the utime + stime delta of each process since the previous
+        tick; processes first seen in this tick have no baseline yet.
+        """
+        now = time.monotonic()
+        total = 0.0
+        measured = False
+        for pid in all_pids:
+            stat = self._read_stat(pid)
+            if stat is None:
+                continue
+            try:
+                ticks = get_cpu_ticks(stat)
+            except ValueError, IndexError:
+                continue
+            self._cpu_ticks[pid] = (ticks, now)
 
-    def _get_cpu_with_children(self, pid: int) -> float | None:
-        """Get aggregated CPU for a process and all its children."""
-        # Collect all PIDs (parent + children)
-        all_pids = [pid] + get_child_pids(pid)
+            prev = self._prev_cpu_ticks.get(pid)
+            if prev is not None and now > prev[1]:
+                total += 100.0 * (ticks - prev[0]) / CLOCK_TICKS / (now - prev[1])
+                measured = True
 
-        # Get CPU for all PIDs
-        cpu_readings = self._get_cpu_via_top(all_pids)
+        return total if measured else None
 
-        if not cpu_readings:
-            return None
+    def _get_process_memory(self, pid: int) -> MemoryInfo | None:
+        smaps = self._proc_files.read(f"/proc/{pid}/smaps_rollup")
+        return get_smaps_memory(smaps) if smaps is not None else None
 
-        # Sum CPU of all processes
-        return sum(cpu_readings.values())
+    def _get_process_rss(self, pid: int) -> float | None:
+        statm = self._proc_files.read(f"/proc/{pid}/statm")
+        return get_statm_rss(statm) if statm is not None else None
 
-    def _get_memory(self, pid: int) -> MemoryInfo | None:
-        """Get aggregated memory (PSS, USS) for a process and all children.
+    def _get_memory(self, pid: int, child_pids: list[int]) -> MemoryInfo | None:
+        """Get aggregated memory for a process and all children.
 
-        PSS: Total proportional memory usage (for capacity planning)
-        USS: Total private memory (would be freed if all processes exit)
+        RSS: Total resident memory, counting shared pages in every process
+        PSS: Total proportional memory usage (for capacity planning, detailed only)
+        USS: Total private memory (would be freed if all processes exit, detailed only)
         """
-        mem = get_process_memory(pid)
+        if not self.detailed_memory:
+            # Sum resident pages over the whole tree, converting to MB once
+            read = self._proc_files.read
+            statms = [read(f"/proc/{tree_pid}/statm") for tree_pid in (pid, *child_pids)]
+            if statms[0] is None:
+                return None
+            try:
+                rss_pages = sum(int(statm.split()[1]) for statm in statms if statm)
+            except ValueError, IndexError:
+                return None
+            return MemoryInfo(rss=rss_pages * PAGE_SIZE / (1024 * 1024))
+
+        mem = self._get_process_memory(pid)
         if mem is None:
             # Fallback to RSS only
-            rss = get_process_rss(pid)
+            rss = self._get_process_rss(pid)
             if rss is None:
                 return None
             mem = MemoryInfo(pss=rss, uss=rss, rss=rss)
 
         total_pss = mem.pss
         total_uss = mem.uss
+        total_rss = mem.rss
 
         # Add memory from child processes
-        for child_pid in get_child_pids(pid):
-            child_mem = get_process_memory(child_pid)
+        for child_pid in child_pids:
+            child_mem = self._get_process_memory(child_pid)
             if child_mem:
                 total_pss += child_mem.pss
                 total_uss += child_mem.uss
+                total_rss += child_mem.rss
             else:
                 # Fallback to RSS
-                child_rss = get_process_rss(child_pid)
+                child_rss = self._get_process_rss(child_pid)
                 if child_rss:
                     total_pss += child_rss
                     total_uss += child_rss
+                    total_rss += child_rss
 
-        return MemoryInfo(pss=total_pss, uss=total_uss, rss=0)
+        return MemoryInfo(pss=total_pss, uss=total_uss, rss=total_rss)
 
     def run(self) -> None:
-        while self.running:
-            pid_list = list(self.pids.keys())
-
-            # Get CPU and memory for each process (including children)
-            for pid in pid_list:
-                cpu = self._get_cpu_with_children(pid)
-                if cpu is not None:
-                    self.stats[pid].cpu_samples.append(cpu)
-
-                mem = self._get_memory(pid)
-                if mem is not None:
-                    self.stats[pid].pss_samples.append(mem.pss)
-                    self.stats[pid].uss_samples.append(mem.uss)
-
-            time.sleep(self.interval)
+        try:
+            while self.running:
+                pid_list = list(self.pids.keys())
+                self._cpu_ticks = {}
+                self._stats = {}
+                sampled = 0
+
+                # Get CPU and memory for each process (including children),
+                # walking each process tree once per tick
+                for pid in pid_list:
+                    child_pids = self._get_child_pids(pid)
+                    sampled += 1 + len(child_pids)
+
+                    cpu = self._get_cpu_with_children([pid] + child_pids)
+                    if cpu is not None:
+                        self.stats[pid].cpu.add(cpu)
+
+                    mem = self._get_memory(pid, child_pids)
+                    if mem is not None:
+                        self.stats[pid].rss.add(mem.rss)
+                        if self.detailed_memory:
+                            self.stats[pid].pss.add(mem.pss)
+                            self.stats[pid].uss.add(mem.uss)
+
+                self._prev_cpu_ticks = self._cpu_ticks
+                self._proc_files.prune()
+
+                interval = self.interval * max(1.0, sampled / MONITOR_PROCS_PER_INTERVAL)
+                self._wakeup.wait(min(max(interval, MONITOR_MIN_INTERVAL), MONITOR_MAX_INTERVAL))
+        finally:
+            self._proc_files.close()
 
     def stop(self) -> None:
         self.running = False
+        self._wakeup.set()
 
 
 # =============================================================================
@@ -395,6 +501,11 @@ Examples:
         action="store_true",
         help="All clients use the same multicast address (default: each client uses a unique address)",
     )
+    parser.add_argument(
+        "--detailed-memory",
+        action="store_true",
+        help="Report PSS/USS from smaps_rollup instead of RSS from statm (walks page tables of measured processes)",
+    )
     return parser.parse_args()
 
 
@@ -413,13 +524,36 @@ def find_project_root() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
+def wait_for_port(port: int, poll: Callable[[], int | None], timeout: float = SERVER_START_TIMEOUT) -> bool:
+    """Wait until something accepts TCP connections on 127.0.0.1:port.
+
+    Retries with exponential back-off, capped at SERVER_POLL_MAX_DELAY.
+    Gives up early once poll() reports that the server has exited.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=SERVER_POLL_MAX_DELAY):
+                return True
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, SERVER_POLL_MAX_DELAY)
+    return False
+
+
 def main() -> int:
     args = parse_args()
 
+    # Only needed once the test actually runs, not for --help or argument errors
+    import subprocess
+
     # Get program configuration
     config = PROGRAM_CONFIGS[args.program]
     port = config["port"]
-    build_args: Callable = config["build_args"]
 
     project_root = find_project_root()
     tools_dir = project_root / "tools"
@@ -473,6 +607,8 @@ def main() -> int:
 
     processes: list[subprocess.Popen] = []
     monitor: ResourceMonitor | None = None
+    # Readable pidfds of the server and replay processes, signalled when they exit
+    exit_selector = selectors.DefaultSelector()
     server_proc: subprocess.Popen | None = None
 
     try:
@@ -507,7 +643,7 @@ def main() -> int:
             if not config_path.exists():
                 print(f"Error: {args.program} config not found: {config_path}", file=sys.stderr)
                 return 1
-        server_cmd = build_args(binary_path, m3u_file, port, config_path)
+        server_cmd = build_server_args(args.program, binary_path, m3u_file, port, config_path)
         server_proc = subprocess.Popen(
             server_cmd,
             stdout=subprocess.PIPE if not args.verbose else None,
@@ -518,12 +654,12 @@ def main() -> int:
         print(f"  PID: {server_proc.pid}")
         print(f"  CMD: {' '.join(server_cmd)}")
 
-        # Give server time to start
-        time.sleep(1.0)
-
-        # Check if server is still running
-        if server_proc.poll() is not None:
-            print(f"Error: {args.program} exited unexpectedly", file=sys.stderr)
+        # Wait until the server accepts connections
+        if not wait_for_port(port, server_proc.poll):
+            if server_proc.poll() is not None:
+                print(f"Error: {args.program} exited unexpectedly", file=sys.stderr)
+            else:
+                print(f"Error: {args.program} is not listening on port {port}", file=sys.stderr)
             return 1
 
         # 3. Start curl clients
@@ -534,24 +670,30 @@ def main() -> int:
             print(f"  Each client uses a unique address in {MULTICAST_BASE}.0/24")
         curl_procs: list[subprocess.Popen] = []
 
-        for i in range(args.clients):
-            # Use same address for all clients if --same-address, otherwise unique per client
-            client_index = 0 if args.same_address else i
-            stream_url = get_stream_url(client_index)
-            full_stream_url = f"http://127.0.0.1:{port}/{stream_url}"
-            if i == 0:
-                if args.same_address:
-                    print(f"  URL: {full_stream_url}")
-                else:
-                    print(f"  URLs: {full_stream_url} ... (and {args.clients - 1} more)")
+        # Use same address for all clients if --same-address, otherwise unique per client
+        stream_urls = [
+            f"http://127.0.0.1:{port}/{get_stream_url(0 if args.same_address else i)}" for i in range(args.clients)
+        ]
+        if args.same_address:
+            print(f"  URL: {stream_urls[0]}")
+        else:
+            print(f"  URLs: {stream_urls[0]} ... (and {args.clients - 1} more)")
+
+        # Each curl process drives many clients as concurrent transfers on
+        # one event loop, instead of forking a curl per client
+        for start in range(0, args.clients, CURL_MAX_PARALLEL):
+            batch = stream_urls[start : start + CURL_MAX_PARALLEL]
             curl_cmd = [
                 "curl",
-                "-o",
-                "/dev/null",
+                "--parallel",
+                "--parallel-immediate",
+                "--parallel-max",
+                str(len(batch)),
                 "--no-buffer",
                 "-s",  # Silent mode
-                full_stream_url,
             ]
+            for stream_url in batch:
+                curl_cmd += ["-o", "/dev/null", stream_url]
             curl_proc = subprocess.Popen(
                 curl_cmd,
                 stdout=subprocess.DEVNULL,
@@ -560,7 +702,7 @@ def main() -> int:
             curl_procs.append(curl_proc)
             processes.append(curl_proc)
 
-        print(f"  PIDs: {[p.pid for p in curl_procs]}")
+        print(f"  PIDs: {[p.pid for p in curl_procs]} ({args.clients} parallel transfers)")
 
         # Start resource monitoring
         print("\n[Monitoring] Starting resource monitor...")
@@ -572,26 +714,26 @@ def main() -> int:
         for i, curl_proc in enumerate(curl_procs):
             pids_to_monitor[curl_proc.pid] = f"curl-{i + 1}"
 
-        monitor = ResourceMonitor(pids_to_monitor, interval=0.5)
+        monitor = ResourceMonitor(pids_to_monitor, interval=0.5, detailed_memory=args.detailed_memory)
         monitor.start()
 
         # Run for specified duration
         print(f"\n[Running] Test running for {args.duration} seconds...")
         print("  (Press Ctrl+C to stop early)\n")
 
-        start_time = time.monotonic()
-        while time.monotonic() - start_time < args.duration:
-            # Check if key processes are still running
-            if server_proc.poll() is not None:
-                print(f"Warning: {args.program} exited during test", file=sys.stderr)
-                break
-            if replay_proc.poll() is not None:
-                print("Warning: replay process exited during test", file=sys.stderr)
-                break
+        # Wait on pidfds so an exit of a key process ends the wait right away,
+        # without polling waitpid() for each of them every tick
+        exit_selector.register(os.pidfd_open(server_proc.pid), selectors.EVENT_READ, args.program)
+        exit_selector.register(os.pidfd_open(replay_proc.pid), selectors.EVENT_READ, "replay process")
 
-            elapsed = time.monotonic() - start_time
+        start_time = time.monotonic()
+        while (elapsed := time.monotonic() - start_time) < args.duration:
             print(f"\r  Progress: {elapsed:.1f}s / {args.duration}s", end="", flush=True)
-            time.sleep(0.5)
+
+            exited = exit_selector.select(timeout=min(0.5, args.duration - elapsed))
+            if exited:
+                print(f"Warning: {exited[0][0].data} exited during test", file=sys.stderr)
+                break
 
         print("\n")
 
@@ -599,6 +741,11 @@ def main() -> int:
         print("\n\nInterrupted by user")
 
     finally:
+        for key in list(exit_selector.get_map().values()):
+            exit_selector.unregister(key.fileobj)
+            os.close(key.fd)
+        exit_selector.close()
+
         # Stop monitor
         if monitor:
             monitor.stop()
@@ -637,47 +784,68 @@ def main() -> int:
                 curl_stats.append(stats)
 
         # Server stats
-        if server_stats and server_stats.cpu_samples:
+        if server_stats and server_stats.cpu.count:
             print(f"\n[{args.program}]")
-            print(f"  CPU:  avg={server_stats.cpu_avg:6.2f}%  max={server_stats.cpu_max:6.2f}%")
-            print(f"  PSS:  avg={server_stats.pss_avg:6.2f}MB max={server_stats.pss_max:6.2f}MB")
-            print(f"  USS:  avg={server_stats.uss_avg:6.2f}MB max={server_stats.uss_max:6.2f}MB")
+            print(f"  CPU:  avg={server_stats.cpu.avg:6.2f}%  max={server_stats.cpu.max:6.2f}%")
+            if args.detailed_memory:
+                print(f"  PSS:  avg={server_stats.pss.avg:6.2f}MB max={server_stats.pss.max:6.2f}MB")
+                print(f"  USS:  avg={server_stats.uss.avg:6.2f}MB max={server_stats.uss.max:6.2f}MB")
+            else:
+                print(f"  RSS:  avg={server_stats.rss.avg:6.2f}MB max={server_stats.rss.max:6.2f}MB")
 
         # Replay stats
-        if replay_stats and replay_stats.cpu_samples:
+        if replay_stats and replay_stats.cpu.count:
             print("\n[replay (udp_replay.py)]")
-            print(f"  CPU:  avg={replay_stats.cpu_avg:6.2f}%  max={replay_stats.cpu_max:6.2f}%")
-            print(f"  PSS:  avg={replay_stats.pss_avg:6.2f}MB max={replay_stats.pss_max:6.2f}MB")
-            print(f"  USS:  avg={replay_stats.uss_avg:6.2f}MB max={replay_stats.uss_max:6.2f}MB")
+            print(f"  CPU:  avg={replay_stats.cpu.avg:6.2f}%  max={replay_stats.cpu.max:6.2f}%")
+            if args.detailed_memory:
+                print(f"  PSS:  avg={replay_stats.pss.avg:6.2f}MB max={replay_stats.pss.max:6.2f}MB")
+                print(f"  USS:  avg={replay_stats.uss.avg:6.2f}MB max={replay_stats.uss.max:6.2f}MB")
+            else:
+                print(f"  RSS:  avg={replay_stats.rss.avg:6.2f}MB max={replay_stats.rss.max:6.2f}MB")
 
         # Aggregate curl stats
         if curl_stats:
-            total_cpu_avg = sum(s.cpu_avg for s in curl_stats)
-            total_cpu_max = sum(s.cpu_max for s in curl_stats)
-            total_pss_avg = sum(s.pss_avg for s in curl_stats)
-            total_pss_max = sum(s.pss_max for s in curl_stats)
-            total_uss_avg = sum(s.uss_avg for s in curl_stats)
-            total_uss_max = sum(s.uss_max for s in curl_stats)
-
-            print(f"\n[curl clients x{len(curl_stats)} (aggregated)]")
+            # Sum per-client averages and peaks in a single pass
+            total_cpu_avg = total_cpu_max = 0.0
+            total_pss_avg = total_pss_max = 0.0
+            total_uss_avg = total_uss_max = 0.0
+            total_rss_avg = total_rss_max = 0.0
+            for s in curl_stats:
+                total_cpu_avg += s.cpu.avg
+                total_cpu_max += s.cpu.max
+                total_pss_avg += s.pss.avg
+                total_pss_max += s.pss.max
+                total_uss_avg += s.uss.avg
+                total_uss_max += s.uss.max
+                total_rss_avg += s.rss.avg
+                total_rss_max += s.rss.max
+
+            print(f"\n[curl clients x{args.clients} (aggregated)]")
             print(f"  CPU:  avg={total_cpu_avg:6.2f}%  max={total_cpu_max:6.2f}%")
-            print(f"  PSS:  avg={total_pss_avg:6.2f}MB max={total_pss_max:6.2f}MB")
-            print(f"  USS:  avg={total_uss_avg:6.2f}MB max={total_uss_max:6.2f}MB")
+            if args.detailed_memory:
+                print(f"  PSS:  avg={total_pss_avg:6.2f}MB max={total_pss_max:6.2f}MB")
+                print(f"  USS:  avg={total_uss_avg:6.2f}MB max={total_uss_max:6.2f}MB")
+            else:
+                print(f"  RSS:  avg={total_rss_avg:6.2f}MB max={total_rss_max:6.2f}MB")
 
         # Summary
-        if server_stats and server_stats.cpu_samples:
+        if server_stats and server_stats.cpu.count:
             print("\n" + "-" * 60)
             print(f"SUMMARY ({args.program})")
             print("-" * 60)
             print(f"  Test duration:  {args.duration}s")
             print(f"  Clients:        {args.clients}")
             print(f"  Replay speed:   {args.speed}x (~{8 * args.speed:.0f} Mbps)")
-            print(f"  CPU average:    {server_stats.cpu_avg:.2f}%")
-            print(f"  CPU peak:       {server_stats.cpu_max:.2f}%")
-            print(f"  PSS average:    {server_stats.pss_avg:.2f} MB (proportional)")
-            print(f"  PSS peak:       {server_stats.pss_max:.2f} MB")
-            print(f"  USS average:    {server_stats.uss_avg:.2f} MB (private only)")
-            print(f"  USS peak:       {server_stats.uss_max:.2f} MB")
+            print(f"  CPU average:    {server_stats.cpu.avg:.2f}%")
+            print(f"  CPU peak:       {server_stats.cpu.max:.2f}%")
+            if args.detailed_memory:
+                print(f"  PSS average:    {server_stats.pss.avg:.2f} MB (proportional)")
+                print(f"  PSS peak:       {server_stats.pss.max:.2f} MB")
+                print(f"  USS average:    {server_stats.uss.avg:.2f} MB (private only)")
+                print(f"  USS peak:       {server_stats.uss.max:.2f} MB")
+            else:
+                print(f"  RSS average:    {server_stats.rss.avg:.2f} MB (includes shared)")
+                print(f"  RSS peak:       {server_stats.rss.max:.2f} MB")
             print("=" * 60)
 
     return 0
@@ -9,26 +9,54 @@ Used for testing rtp2httpd with controlled data sources.
 """
 
 import argparse
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import mmap
+import os
 import random
+import select
 import socket
 import struct
 import sys
 import time
-from collections.abc import Callable
-from dataclasses import dataclass
+from array import array
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 from threading import Thread, Event, Lock
 
-from scapy.all import PcapNgReader, UDP, IP, Raw  # pyright: ignore[reportAttributeAccessIssue]
-
-
-def is_rtp_packet(payload: bytes) -> bool:
+# pcapng block types
+PCAPNG_SHB = 0x0A0D0D0A  # Section Header Block
+PCAPNG_IDB = 0x00000001  # Interface Description Block
+PCAPNG_SPB = 0x00000003  # Simple Packet Block
+PCAPNG_EPB = 0x00000006  # Enhanced Packet Block
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_BYTE_ORDER_MAGIC_SWAPPED = 0x4D3C2B1A
+PCAPNG_OPT_IF_TSRESOL = 9
+
+# Link-layer header types (https://www.tcpdump.org/linktypes.html)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+ETHERTYPE_PPPOE_SESSION = 0x8864
+PPP_PROTO_IPV4 = 0x0021
+
+
+def is_rtp_packet(payload: bytes | memoryview) -> bool:
     """Check if payload is an RTP packet (version 2)."""
     return len(payload) >= 12 and (payload[0] & 0xC0) == 0x80
 
 
-def patch_rtp_sequence(payload: bytes, seq_offset: int) -> bytes:
-    """Patch RTP sequence number in payload.
+def get_rtp_sequence(payload: bytes | memoryview) -> int:
+    """Return the RTP sequence number of payload, or -1 if it is not RTP.
 
     RTP header format (first 12 bytes):
     - Byte 0: V=2, P, X, CC
@@ -36,28 +64,213 @@ def patch_rtp_sequence(payload: bytes, seq_offset: int) -> bytes:
     - Bytes 2-3: Sequence number (big-endian)
     """
     if not is_rtp_packet(payload):
-        return payload
+        return -1
+    return (payload[2] << 8) | payload[3]
+
+
+_RTP_SEQ = struct.Struct("!H")
 
-    # Calculate new sequence number (wrap at 65536)
-    orig_seq = (payload[2] << 8) | payload[3]
-    new_seq = (orig_seq + seq_offset) & 0xFFFF
 
-    # Patch in place using bytearray
-    patched = bytearray(payload)
-    patched[2] = (new_seq >> 8) & 0xFF
-    patched[3] = new_seq & 0xFF
+def patch_rtp_sequences(buf: bytearray, offsets: array, seqs: array, seq_offset: int) -> None:
+    """Rewrite the RTP packets starting at buf[offsets[i]] with sequence number seqs[i] + seq_offset.
 
-    return bytes(patched)
+    Sequence numbers wrap at 65536. The packets are patched in place.
+    """
+    pack_into = _RTP_SEQ.pack_into
+    for offset, seq in zip(offsets, seqs):
+        pack_into(buf, offset + 2, (seq + seq_offset) & 0xFFFF)
 
 
 @dataclass
-class PacketInfo:
-    """Parsed UDP packet information."""
+class PacketTable:
+    """Struct-of-arrays store of the loaded packets for the replay hot loop.
+
+    Payloads are stored back to back in one ``arena`` buffer; packet ``i``
+    occupies ``arena[offsets[i]:offsets[i] + lengths[i]]``. Destinations are
+    deduplicated into ``dests``/``sockaddrs``/``dest_counts`` while loading and
+    referenced per packet through ``dest_idx``, so no later pass over the
+    packets is needed to summarize them. RTP packets are also indexed per
+    destination port in ``rtp_streams`` as (arena offsets, captured sequence
+    numbers), which is all continuous mode needs to renumber them.
+    """
 
-    timestamp: float
-    payload: bytes
-    dst_addr: str
-    dst_port: int
+    timestamps: array = field(default_factory=lambda: array("d"))
+    arena: bytearray = field(default_factory=bytearray)
+    offsets: array = field(default_factory=lambda: array("Q"))
+    lengths: array = field(default_factory=lambda: array("I"))
+    ports: array = field(default_factory=lambda: array("H"))
+    dest_idx: array = field(default_factory=lambda: array("i"))
+    dests: list[tuple[str, int]] = field(default_factory=list)
+    sockaddrs: list[bytes] = field(default_factory=list)  # Pre-packed struct sockaddr_in per destination
+    dest_counts: list[int] = field(default_factory=list)  # Packets per destination
+    rtp_streams: dict[int, tuple[array, array]] = field(default_factory=dict)
+    _dest_index: dict[tuple[str, int], int] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def append(self, timestamp: float, dst_addr: str, dst_port: int, payload: bytes | memoryview) -> None:
+        """Copy one datagram into the table."""
+        dest = (dst_addr, dst_port)
+        idx = self._dest_index.get(dest)
+        if idx is None:
+            idx = self._dest_index[dest] = len(self.dests)
+            self.dests.append(dest)
+            self.sockaddrs.append(pack_sockaddr_in(dst_addr, dst_port))
+            self.dest_counts.append(0)
+        self.dest_counts[idx] += 1
+
+        seq = get_rtp_sequence(payload)
+        if seq >= 0:
+            stream = self.rtp_streams.get(dst_port)
+            if stream is None:
+                stream = self.rtp_streams[dst_port] = (array("Q"), array("H"))
+            stream[0].append(len(self.arena))
+            stream[1].append(seq)
+
+        self.timestamps.append(timestamp)
+        self.offsets.append(len(self.arena))
+        self.lengths.append(len(payload))
+        self.arena += payload
+        self.ports.append(dst_port)
+        self.dest_idx.append(idx)
+
+    def payload(self, i: int) -> memoryview:
+        """Return a zero-copy view of packet i's payload."""
+        offset = self.offsets[i]
+        return memoryview(self.arena)[offset : offset + self.lengths[i]]
+
+
+def get_ipv4_offset(frame: memoryview, linktype: int) -> int:
+    """Return the offset of the IPv4 header inside a captured frame, or -1."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = (frame[offset] << 8) | frame[offset + 1] if len(frame) >= 14 else 0
+        # Skip 802.1Q / 802.1ad VLAN tags
+        while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 6:
+            offset += 4
+            ethertype = (frame[offset] << 8) | frame[offset + 1]
+        offset += 2
+        if ethertype == ETHERTYPE_PPPOE_SESSION:
+            # 6-byte PPPoE header followed by the 2-byte PPP protocol field
+            if len(frame) < offset + 8 or ((frame[offset + 6] << 8) | frame[offset + 7]) != PPP_PROTO_IPV4:
+                return -1
+            return offset + 8
+        return offset if ethertype == ETHERTYPE_IPV4 else -1
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        return 0
+    if linktype == LINKTYPE_LINUX_SLL:
+        return 16 if len(frame) >= 16 and ((frame[14] << 8) | frame[15]) == ETHERTYPE_IPV4 else -1
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return 20 if len(frame) >= 20 and ((frame[0] << 8) | frame[1]) == ETHERTYPE_IPV4 else -1
+    if linktype == LINKTYPE_NULL:
+        # 4-byte address family in the capturing host's byte order; AF_INET is 2 everywhere
+        return 4 if len(frame) >= 4 and bytes(frame[:4]) in (b"\x02\x00\x00\x00", b"\x00\x00\x00\x02") else -1
+    return -1
+
+
+def parse_udp_datagram(frame: memoryview, linktype: int) -> tuple[str, int, memoryview] | None:
+    """Extract (dst_addr, dst_port, payload) from an IPv4/UDP frame."""
+    ip = get_ipv4_offset(frame, linktype)
+    if ip < 0 or len(frame) < ip + 20:
+        return None
+
+    version_ihl = frame[ip]
+    if version_ihl >> 4 != 4 or frame[ip + 9] != socket.IPPROTO_UDP:
+        return None
+    # Non-first fragments carry no UDP header
+    if ((frame[ip + 6] << 8) | frame[ip + 7]) & 0x1FFF:
+        return None
+
+    udp = ip + (version_ihl & 0x0F) * 4
+    if len(frame) < udp + 8:
+        return None
+
+    dst_addr = socket.inet_ntoa(frame[ip + 16 : ip + 20])
+    dst_port = (frame[udp + 2] << 8) | frame[udp + 3]
+    # Trust the UDP length over the frame length so Ethernet padding is dropped
+    udp_len = (frame[udp + 4] << 8) | frame[udp + 5]
+    end = udp + udp_len if udp_len >= 8 else len(frame)
+    return dst_addr, dst_port, frame[udp + 8 : end]
+
+
+def read_pcapng(filepath: Path) -> Iterator[tuple[float, int, memoryview]]:
+    """Iterate over (timestamp, linktype, frame) records of a pcapng file.
+
+    Frames are memoryview slices of a read-only mapping of the file, valid for
+    the lifetime of the iterator. Mapping instead of reading keeps the capture
+    in the page cache only, so loading does not hold a second copy of it next
+    to the payload arena.
+    """
+    with filepath.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data.madvise(mmap.MADV_SEQUENTIAL)
+    view = memoryview(data)
+    offset = 0
+    endian = "<"
+    # Per-interface (linktype, timestamp resolution) within the current section
+    interfaces: list[tuple[int, float]] = []
+
+    while offset + 12 <= size:
+        block_type = struct.unpack_from(endian + "I", data, offset)[0]
+
+        if block_type == PCAPNG_SHB:
+            magic = struct.unpack_from("<I", data, offset + 8)[0]
+            if magic == PCAPNG_BYTE_ORDER_MAGIC:
+                endian = "<"
+            elif magic == PCAPNG_BYTE_ORDER_MAGIC_SWAPPED:
+                endian = ">"
+            else:
+                raise ValueError(f"Bad pcapng byte-order magic at offset {offset}")
+            interfaces = []
+
+        block_len = struct.unpack_from(endian + "I", data, offset + 4)[0]
+        if block_len < 12 or offset + block_len > size:
+            raise ValueError(f"Truncated pcapng block at offset {offset}")
+        if block_len % 4 != 0:
+            raise ValueError(f"Bad pcapng block length at offset {offset}")
+
+        if block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(endian + "H", data, offset + 8)[0]
+            ts_unit = 1e-6
+            # Walk options looking for if_tsresol
+            opt = offset + 16
+            end = offset + block_len - 4
+            while opt + 4 <= end:
+                code, length = struct.unpack_from(endian + "HH", data, opt)
+                if code == 0:
+                    break
+                if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+                    tsresol = data[opt + 4]
+                    ts_unit = 2.0 ** -(tsresol & 0x7F) if tsresol & 0x80 else 10.0**-tsresol
+                opt += 4 + ((length + 3) & ~3)
+            interfaces.append((linktype, ts_unit))
+
+        elif block_type == PCAPNG_EPB:
+            if block_len < 32:
+                raise ValueError(f"Bad EPB at offset {offset}")
+            if_id, ts_high, ts_low, cap_len = struct.unpack_from(endian + "IIII", data, offset + 8)
+            # The frame must fit between the 28-byte header and the trailing length
+            if cap_len > block_len - 32:
+                raise ValueError(f"Bad EPB at offset {offset}")
+            if if_id < len(interfaces):
+                linktype, ts_unit = interfaces[if_id]
+                frame = view[offset + 28 : offset + 28 + cap_len]
+                yield ((ts_high << 32) | ts_low) * ts_unit, linktype, frame
+
+        elif block_type == PCAPNG_SPB:
+            # Simple Packet Blocks have no timestamp and always use interface 0
+            if block_len < 16:
+                raise ValueError(f"Bad SPB at offset {offset}")
+            if interfaces:
+                cap_len = block_len - 16
+                frame = view[offset + 12 : offset + 12 + cap_len]
+                yield 0.0, interfaces[0][0], frame
+
+        offset += block_len
 
 
 def parse_args() -> argparse.Namespace:
@@ -119,42 +332,54 @@ Examples:
         action="store_true",
         help="Continuous replay without gaps, with incrementing RTP seq numbers",
     )
+    parser.add_argument(
+        "--no-gso",
+        action="store_true",
+        help="Disable UDP segmentation offload for batched same-destination datagrams (Linux)",
+    )
+    parser.add_argument(
+        "--txtime",
+        action="store_true",
+        help="Let the kernel pace sends with SO_TXTIME (Linux, needs the fq qdisc)",
+    )
+    parser.add_argument(
+        "--zerocopy",
+        action="store_true",
+        help="Send with MSG_ZEROCOPY so the kernel reads payloads without copying them (Linux)",
+    )
+    parser.add_argument(
+        "--rt",
+        type=int,
+        nargs="?",
+        const=-1,
+        metavar="CPU",
+        help="Replay with SCHED_FIFO priority, pinned to CPU (default: last CPU) with memory locked (Linux)",
+    )
     return parser.parse_args()
 
 
-def load_packets(filepath: Path) -> list[PacketInfo]:
+def load_packets(filepath: Path) -> PacketTable:
     """Load UDP packets from pcapng file."""
-    packets: list[PacketInfo] = []
+    packets = PacketTable()
 
     print(f"Loading {filepath}...", flush=True)
 
-    with PcapNgReader(str(filepath)) as reader:
-        for pkt in reader:
-            if UDP in pkt and IP in pkt:
-                if Raw in pkt:
-                    payload = bytes(pkt[Raw].load)
-                else:
-                    payload = bytes(pkt[UDP].payload)
-
-                if payload:
-                    packets.append(
-                        PacketInfo(
-                            timestamp=float(pkt.time),
-                            payload=payload,
-                            dst_addr=pkt[IP].dst,
-                            dst_port=pkt[UDP].dport,
-                        )
-                    )
+    for timestamp, linktype, frame in read_pcapng(filepath):
+        datagram = parse_udp_datagram(frame, linktype)
+        if datagram is None:
+            continue
+
+        dst_addr, dst_port, payload = datagram
+        if payload:
+            packets.append(timestamp, dst_addr, dst_port, payload)
 
     if packets:
-        duration = packets[-1].timestamp - packets[0].timestamp
-        dests = set((p.dst_addr, p.dst_port) for p in packets)
+        duration = packets.timestamps[-1] - packets.timestamps[0]
         print(
             f"Loaded {len(packets)} UDP packets (duration: {duration:.2f}s)",
             flush=True,
         )
-        for addr, port in sorted(dests):
-            count = sum(1 for p in packets if p.dst_addr == addr and p.dst_port == port)
+        for (addr, port), count in sorted(zip(packets.dests, packets.dest_counts)):
             print(f"  -> {addr}:{port} ({count} packets)", flush=True)
     else:
         print("No UDP packets found in file", flush=True)
@@ -181,16 +406,13 @@ def proc_format_to_ip(hex_str: str) -> str:
     return f"{octets[0]}.{octets[1]}.{octets[2]}.{octets[3]}"
 
 
-def check_igmp_membership(group_addr: str) -> bool:
-    """Check if any process is subscribed to the multicast group."""
-    target = ip_to_proc_format(group_addr)
-
+def read_proc_igmp() -> str:
+    """Read /proc/net/igmp, returning an empty string when unavailable."""
     try:
         with open("/proc/net/igmp", "r") as f:
-            content = f.read()
-            return target in content
+            return f.read()
     except IOError:
-        return False
+        return ""
 
 
 def get_subnet_for_ip(ip: str, prefix_len: int = 24) -> str:
@@ -209,48 +431,46 @@ def get_subnet_for_ip(ip: str, prefix_len: int = 24) -> str:
     return f"{net_octets[0]}.{net_octets[1]}.{net_octets[2]}.{net_octets[3]}/{prefix_len}"
 
 
-def is_ip_in_subnet(ip: str, subnet: str) -> bool:
-    """Check if an IP address is within a subnet (e.g., 239.81.0.0/24)."""
+def parse_subnet(subnet: str) -> tuple[int, int]:
+    """Parse a subnet (e.g., 239.81.0.0/24) into (network, mask) integers."""
     net_addr, prefix_len = subnet.split("/")
-    prefix_len = int(prefix_len)
+    mask = (0xFFFFFFFF << (32 - int(prefix_len))) & 0xFFFFFFFF
+    return int.from_bytes(socket.inet_aton(net_addr), "big") & mask, mask
 
-    ip_octets = [int(x) for x in ip.split(".")]
-    net_octets = [int(x) for x in net_addr.split(".")]
 
-    ip_int = (ip_octets[0] << 24) | (ip_octets[1] << 16) | (ip_octets[2] << 8) | ip_octets[3]
-    net_int = (net_octets[0] << 24) | (net_octets[1] << 16) | (net_octets[2] << 8) | net_octets[3]
+def parse_igmp_groups(content: str) -> set[str]:
+    """Return the group addresses listed in /proc/net/igmp, in its hex format.
 
-    mask = (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
-    return (ip_int & mask) == (net_int & mask)
+    ``content`` is the text of /proc/net/igmp as returned by read_proc_igmp().
+    """
+    groups = set()
+    for line in content.splitlines():
+        # Group lines are tab-indented under their interface line
+        if line.startswith("\t"):
+            parts = line.split(None, 1)
+            if parts and len(parts[0]) == 8:
+                groups.add(parts[0])
+    return groups
 
 
-def get_igmp_joined_groups(subnets: list[str]) -> set[str]:
-    """Get all multicast groups currently joined that are within the specified subnets."""
-    joined = set()
+def get_igmp_joined_groups(subnets: list[tuple[int, int]], groups: set[str]) -> set[str]:
+    """Get all multicast groups currently joined that are within the specified subnets.
 
-    try:
-        with open("/proc/net/igmp", "r") as f:
-            for line in f:
-                # Skip header and interface lines
-                line = line.strip()
-                if not line or line.startswith("Idx") or "\t" not in line:
-                    continue
+    ``subnets`` are (network, mask) pairs from parse_subnet() and ``groups`` is
+    the hex group set returned by parse_igmp_groups().
+    """
+    joined = set()
 
-                # Lines with group addresses start with a tab and have hex address
-                parts = line.split()
-                if len(parts) >= 1:
-                    hex_addr = parts[0]
-                    if len(hex_addr) == 8:
-                        try:
-                            ip = proc_format_to_ip(hex_addr)
-                            for subnet in subnets:
-                                if is_ip_in_subnet(ip, subnet):
-                                    joined.add(ip)
-                                    break
-                        except ValueError, IndexError:
-                            continue
-    except IOError:
-        pass
+    for hex_addr in groups:
+        try:
+            # Reversed byte order: DDCCBBAA for AA.BB.CC.DD
+            ip_int = int.from_bytes(bytes.fromhex(hex_addr), "little")
+        except ValueError:
+            continue
+        for net_int, mask in subnets:
+            if ip_int & mask == net_int:
+                joined.add(proc_format_to_ip(hex_addr))
+                break
 
     return joined
 
@@ -271,18 +491,79 @@ def get_interface_ip(interface: str) -> str:
         sock.close()
 
 
+SEND_BUFFER_SIZE = 8 * 1024 * 1024
+SO_SNDBUFFORCE = 32  # Linux: like SO_SNDBUF but ignores net.core.wmem_max (CAP_NET_ADMIN)
+SEND_BACKPRESSURE_TIMEOUT_MS = 100  # Longest wait for send buffer space before dropping
+
+# SO_TXTIME scheduled transmission (Linux 4.19+), honoured by the fq qdisc. Transmit
+# times are CLOCK_MONOTONIC, which fq expects; etf only accepts CLOCK_TAI and would drop them
+SO_TXTIME = 61
+SCM_TXTIME = SO_TXTIME
+TXTIME_LEAD_NS = 2_000_000  # Hand datagrams to the kernel up to 2ms before their transmit time
+
+# MSG_ZEROCOPY transmission (Linux 5.0+ for UDP)
+SO_ZEROCOPY = 60
+MSG_ZEROCOPY = 0x4000000
+SO_EE_ORIGIN_ZEROCOPY = 5
+_SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")  # ee_errno, origin, type, code, pad, info, data
+ZEROCOPY_REAP_THRESHOLD = 256  # Reap completions once this many sends are outstanding
+# Zerocopy pins each iovec as its own page fragments, and one skb holds at most
+# MAX_SKB_FRAGS (17) of them, so zerocopy GSO runs are capped more tightly
+ZEROCOPY_MAX_FRAGS = 17
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
 def create_multicast_socket(
     interface: str | None = None,
     ttl: int = 1,
+    txtime: bool = False,
+    zerocopy: bool = False,
 ) -> socket.socket:
     """Create UDP socket configured for multicast sending.
 
     By default no outbound interface is forced, so the kernel selects it using
     the OS multicast routing table. This matches devlab and works on macOS.
+
+    The socket is non-blocking with an enlarged send buffer, so bursts are
+    absorbed by the kernel queue; BatchSender waits for space when it is full.
+
+    With ``txtime``, SO_TXTIME is enabled so each datagram can carry its
+    CLOCK_MONOTONIC transmit time for the fq qdisc to pace. With
+    ``zerocopy``, SO_ZEROCOPY is enabled so sends may use MSG_ZEROCOPY.
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    # Option 32 is SO_SNDBUFFORCE only on Linux; elsewhere it is SO_BROADCAST
+    if sys.platform.startswith("linux"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_SNDBUFFORCE, SEND_BUFFER_SIZE)
+        except OSError:
+            # Unprivileged: the request is capped at net.core.wmem_max
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+    else:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+        except OSError:
+            # macOS rejects sizes above kern.ipc.maxsockbuf: keep the default
+            pass
+    sock.setblocking(False)
+
+    if txtime:
+        if not sys.platform.startswith("linux"):
+            raise OSError("--txtime is only supported on Linux")
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_TXTIME, struct.pack("iI", time.CLOCK_MONOTONIC, 0))
+        except OSError as e:
+            raise OSError(f"Failed to enable SO_TXTIME: {e}") from e
+
+    if zerocopy:
+        if not sys.platform.startswith("linux"):
+            raise OSError("--zerocopy is only supported on Linux")
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+        except OSError as e:
+            raise OSError(f"Failed to enable SO_ZEROCOPY: {e}") from e
 
     if interface:
         try:
@@ -298,12 +579,341 @@ def create_multicast_socket(
     return sock
 
 
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        # c_char_p so pre-packed sockaddr bytes can be assigned without a
+        # ctypes.cast() per message; ctypes keeps the object alive meanwhile
+        ("msg_name", ctypes.c_char_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.c_void_p),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def load_sendmmsg() -> Callable[..., int] | None:
+    """Return libc sendmmsg() bound via ctypes, or None when unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fn = libc.sendmmsg
+    except OSError, AttributeError:
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+def pack_sockaddr_in(addr: str, port: int) -> bytes:
+    """Pack an IPv4 address and port into a Linux struct sockaddr_in."""
+    return struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(addr) + bytes(8)
+
+
+# UDP generic segmentation offload (Linux 4.18+)
+SOL_UDP = 17
+UDP_SEGMENT = 103
+GSO_MAX_SEGMENTS = 64
+GSO_MAX_BYTES = 65000  # Stay below the 65507-byte UDP payload limit
+_CMSG_HDR = struct.Struct("@NiiH")  # cmsghdr + u16 segment size
+_TXTIME_CMSG_HDR = struct.Struct("@NiiQ")  # cmsghdr + u64 transmit time
+_TXTIME = struct.Struct("=Q")
+# Each message carries at most one control message, GSO or TXTIME
+_CMSG_SPACE = (_TXTIME_CMSG_HDR.size + ctypes.sizeof(ctypes.c_size_t) - 1) & ~(ctypes.sizeof(ctypes.c_size_t) - 1)
+
+
+class BatchSender:
+    """Queue datagrams and flush them with a single sendmmsg() syscall.
+
+    Datagrams are slices of one payload ``arena`` (see PacketTable), queued as
+    (offset, length), so the iovecs point straight into the arena and no
+    per-datagram buffer objects are created.
+
+    On systems without sendmmsg (macOS, FreeBSD via this binding) every queued
+    datagram is sent immediately with sendto(), so callers can use the same
+    queue/flush sequence everywhere.
+
+    With ``gso`` enabled, consecutive queued datagrams to the same destination
+    with the same size are merged into one UDP_SEGMENT message that the kernel
+    splits back into individual datagrams. GSO is turned off for the rest of
+    the run if the kernel or device rejects it.
+
+    On a non-blocking socket, a full send buffer applies backpressure: the
+    sender polls for POLLOUT and retries, counting each wait in
+    ``backpressure_waits``. Datagrams still without space after
+    SEND_BACKPRESSURE_TIMEOUT_MS are dropped and counted in ``dropped``.
+
+    With ``txtime``, every message carries an SCM_TXTIME control message with
+    the send time passed to queue(); the socket must have SO_TXTIME enabled.
+    GSO is disabled in that mode, since a merged run would share one time.
+
+    With ``zerocopy``, datagrams are sent with MSG_ZEROCOPY so the kernel reads
+    payloads straight from the arena; the socket must have SO_ZEROCOPY enabled.
+    Completions are reaped from the socket error queue, and wait_zerocopy()
+    must be called before modifying arena bytes that may still be in flight.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        arena: bytearray,
+        batch_size: int = 64,
+        gso: bool = True,
+        txtime: bool = False,
+        zerocopy: bool = False,
+    ):
+        self.sock = sock
+        self.batch_size = batch_size
+        self._sendto = sock.sendto
+        self._sendmsg = sock.sendmsg
+        self._sendmmsg = load_sendmmsg()
+        self._txtime = txtime
+        self._gso = gso and not txtime and self._sendmmsg is not None
+        self._zerocopy = zerocopy
+        self._send_flags = MSG_ZEROCOPY if zerocopy else 0
+        self._zerocopy_pending = 0  # Zerocopy sends whose completion has not been reaped
+        self._fd = sock.fileno()
+        # Exporting the buffer pins the arena (it can no longer be resized), so
+        # its address stays valid for the lifetime of the sender
+        self._view = memoryview(arena)
+        self._arena_buf = (ctypes.c_char * len(arena)).from_buffer(arena)
+        self._arena_addr = ctypes.addressof(self._arena_buf)
+        self._msgs = (_MMsgHdr * batch_size)()
+        self._iovs = (_IOVec * batch_size)()
+        self._cmsgs = (ctypes.c_char * (_CMSG_SPACE * batch_size))()
+        # Datagrams queued for the next flush
+        self._pending: list[tuple[int, int, tuple[str, int], bytes, int]] = []
+        self._writable_poller = select.poll()
+        self._writable_poller.register(self._fd, select.POLLOUT)
+        self.backpressure_waits = 0
+        self.dropped = 0
+
+    def _wait_writable(self) -> bool:
+        """Wait for send buffer space, returning False on timeout."""
+        self.backpressure_waits += 1
+        return bool(self._writable_poller.poll(SEND_BACKPRESSURE_TIMEOUT_MS))
+
+    def _send_one(self, offset: int, length: int, dest: tuple[str, int], send_time: int) -> None:
+        try:
+            while True:
+                try:
+                    if self._txtime:
+                        self._sendmsg(
+                            [self._view[offset : offset + length]],
+                            [(socket.SOL_SOCKET, SCM_TXTIME, _TXTIME.pack(send_time))],
+                            self._send_flags,
+                            dest,
+                        )
+                    else:
+                        self._sendto(self._view[offset : offset + length], self._send_flags, dest)
+                    break
+                except BlockingIOError:
+                    if not self._wait_writable():
+                        self.dropped += 1
+                        return
+        except OSError as e:
+            if not (self._zerocopy and e.errno == errno.ENOBUFS):
+                raise
+            # Too many zerocopy sends in flight: drop this one and catch up
+            self.dropped += 1
+            self.wait_zerocopy()
+            return
+        if self._zerocopy:
+            self._zerocopy_pending += 1
+            if self._zerocopy_pending >= ZEROCOPY_REAP_THRESHOLD:
+                self._reap_zerocopy()
+
+    def _reap_zerocopy(self) -> None:
+        """Consume the zerocopy completion notifications that have arrived."""
+        recvmsg = self.sock.recvmsg
+        while self._zerocopy_pending:
+            try:
+                _, ancdata, _, _ = recvmsg(0, 4096, socket.MSG_ERRQUEUE)
+            except BlockingIOError:
+                return
+            for _level, _type, data in ancdata:
+                if len(data) >= _SOCK_EXTENDED_ERR.size:
+                    _, origin, _, _, _, lo, hi = _SOCK_EXTENDED_ERR.unpack_from(data)
+                    if origin == SO_EE_ORIGIN_ZEROCOPY:
+                        # Completions are coalesced into the inclusive range [lo, hi]
+                        self._zerocopy_pending -= (hi - lo + 1) & 0xFFFFFFFF
+
+    def wait_zerocopy(self, timeout: float = 1.0) -> None:
+        """Block until the kernel has released every zerocopy send."""
+        if not self._zerocopy:
+            return
+        poller = select.poll()
+        poller.register(self._fd, select.POLLERR)
+        deadline = time.monotonic() + timeout
+        self._reap_zerocopy()
+        while self._zerocopy_pending > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Do not hang on a lost notification; the next reap catches up
+                return
+            poller.poll(remaining * 1000)
+            self._reap_zerocopy()
+
+    def queue(self, offset: int, length: int, dest: tuple[str, int], sockaddr: bytes, send_time: int) -> None:
+        """Queue the datagram at arena[offset:offset + length], flushing when the batch is full.
+
+        ``sockaddr`` is ``dest`` pre-packed with pack_sockaddr_in(). ``send_time``
+        is the CLOCK_MONOTONIC transmit time in ns, used only in txtime mode.
+        """
+        if self._sendmmsg is None:
+            self._send_one(offset, length, dest, send_time)
+            return
+        self._pending.append((offset, length, dest, sockaddr, send_time))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send all queued datagrams."""
+        pending = self._pending
+        if not pending:
+            return
+        if len(pending) == 1:
+            # sendmmsg has no advantage over sendto for a single datagram
+            offset, length, dest, _, send_time = pending[0]
+            self._send_one(offset, length, dest, send_time)
+            pending.clear()
+            return
+
+        try:
+            self._send_pending(0)
+        finally:
+            pending.clear()
+        if self._zerocopy_pending >= ZEROCOPY_REAP_THRESHOLD:
+            self._reap_zerocopy()
+
+    def _send_pending(self, first: int) -> None:
+        pending = self._pending
+        msgs = self._msgs
+        iovs = self._iovs
+        iov_base = ctypes.addressof(iovs)
+        iov_size = ctypes.sizeof(_IOVec)
+        cmsg_base = ctypes.addressof(self._cmsgs)
+        arena_addr = self._arena_addr
+        gso = self._gso
+        txtime = self._txtime
+        zerocopy = self._zerocopy
+
+        # Build one message per run of datagrams that can share a GSO send
+        msg_starts: list[int] = []
+        count = len(pending)
+        idx = first
+        while idx < count:
+            _, seg_size, _, sockaddr, send_time = pending[idx]
+            run_end = idx + 1
+            if gso:
+                run_bytes = seg_size
+                max_segments = GSO_MAX_SEGMENTS
+                if zerocopy:
+                    max_segments = min(max_segments, ZEROCOPY_MAX_FRAGS // (seg_size // _PAGE_SIZE + 2))
+                while run_end < count and run_end - idx < max_segments:
+                    _, next_length, _, next_sockaddr, _ = pending[run_end]
+                    # Only the last segment of a GSO send may be shorter
+                    if next_sockaddr != sockaddr or next_length > seg_size:
+                        break
+                    run_bytes += next_length
+                    if run_bytes > GSO_MAX_BYTES:
+                        break
+                    run_end += 1
+                    if next_length < seg_size:
+                        break
+
+            for iov_idx in range(idx, run_end):
+                iov_offset, iov_length, _, _, _ = pending[iov_idx]
+                iov = iovs[iov_idx]
+                iov.iov_base = arena_addr + iov_offset
+                iov.iov_len = iov_length
+
+            hdr = msgs[len(msg_starts)].msg_hdr
+            hdr.msg_name = sockaddr
+            hdr.msg_namelen = len(sockaddr)
+            hdr.msg_iov = iov_base + idx * iov_size
+            hdr.msg_iovlen = run_end - idx
+            cmsg_offset = len(msg_starts) * _CMSG_SPACE
+            if run_end - idx > 1:
+                _CMSG_HDR.pack_into(self._cmsgs, cmsg_offset, _CMSG_HDR.size, SOL_UDP, UDP_SEGMENT, seg_size)
+                hdr.msg_control = cmsg_base + cmsg_offset
+                hdr.msg_controllen = _CMSG_SPACE
+            elif txtime:
+                _TXTIME_CMSG_HDR.pack_into(
+                    self._cmsgs, cmsg_offset, _TXTIME_CMSG_HDR.size, socket.SOL_SOCKET, SCM_TXTIME, send_time
+                )
+                hdr.msg_control = cmsg_base + cmsg_offset
+                hdr.msg_controllen = _CMSG_SPACE
+            else:
+                hdr.msg_control = None
+                hdr.msg_controllen = 0
+
+            msg_starts.append(idx)
+            idx = run_end
+
+        # Datagrams are only queued when sendmmsg is available
+        sendmmsg = self._sendmmsg
+        assert sendmmsg is not None
+        msg_count = len(msg_starts)
+        base = ctypes.addressof(msgs)
+        msg_size = ctypes.sizeof(_MMsgHdr)
+        sent = 0
+        while sent < msg_count:
+            result = sendmmsg(self._fd, base + sent * msg_size, msg_count - sent, self._send_flags)
+            if result < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    if self._wait_writable():
+                        continue
+                    # Still no space: drop the rest of the batch rather than stall further
+                    self.dropped += len(pending) - msg_starts[sent]
+                    return
+                if self._zerocopy and err == errno.ENOBUFS:
+                    # Too many zerocopy sends in flight: drop the rest and catch up
+                    self.dropped += len(pending) - msg_starts[sent]
+                    self.wait_zerocopy()
+                    return
+                if gso and err in (errno.EINVAL, errno.EIO, errno.ENOPROTOOPT, errno.EOPNOTSUPP):
+                    # Kernel or device without UDP GSO: resend the rest one datagram per message
+                    print(f"UDP GSO unavailable ({os.strerror(err)}), falling back to plain sendmmsg", flush=True)
+                    self._gso = False
+                    self._send_pending(msg_starts[sent])
+                    return
+                raise OSError(err, os.strerror(err))
+            sent += result
+            if self._zerocopy:
+                self._zerocopy_pending += result
+
+
+IGMP_POLL_INTERVAL = 0.05  # Poll every 50ms for faster response
+
+
 class IGMPMonitor(Thread):
     """Thread that monitors /proc/net/igmp for group membership.
 
     Supports two modes:
     1. Fixed groups mode: monitors specific addresses (legacy)
     2. Subnet mode: monitors entire subnets and dynamically tracks joined groups
+
+    Polls are driven by a periodic timerfd in an epoll loop, together with an
+    eventfd that stop() signals so the thread exits without waiting out a tick.
+
+    ``any_joined`` is set while at least one monitored group is joined, so the
+    replay loop can block on it instead of polling while idle. ``changes`` is
+    bumped on every join or leave, letting the replay loop skip re-reading its
+    targets while membership is unchanged.
     """
 
     def __init__(
@@ -315,11 +925,16 @@ class IGMPMonitor(Thread):
     ):
         super().__init__(daemon=True)
         self.groups = groups or {}  # {address: joined_event}
+        self._group_targets = {addr: ip_to_proc_format(addr) for addr in self.groups}
         self.subnets = subnets or []  # Subnets to monitor (e.g., ["239.81.0.0/24"])
+        self._subnet_masks = [parse_subnet(subnet) for subnet in self.subnets]
         self.on_join = on_join  # Callback when a new group is joined
         self.on_leave = on_leave  # Callback when a group is left
         self._active_groups: set[str] = set()  # Currently joined groups in subnets
         self._lock = Lock()  # Protect active_groups access
+        self.any_joined = Event()  # Set while any fixed group or subnet group is joined
+        self.changes = 0  # Incremented after every membership change
+        self._wakeup_fd = os.eventfd(0, os.EFD_CLOEXEC)  # Signalled by stop()
         self.running = True
 
     def run(self) -> None:
@@ -331,40 +946,70 @@ class IGMPMonitor(Thread):
         else:
             print("IGMP monitor started (polling /proc/net/igmp)", flush=True)
 
-        while self.running:
-            # Handle fixed groups (legacy mode)
-            for addr, event in self.groups.items():
-                is_joined = check_igmp_membership(addr)
-
-                if is_joined and not event.is_set():
-                    print(f"IGMP Join detected: {addr}", flush=True)
-                    event.set()
-                elif not is_joined and event.is_set():
-                    print(f"IGMP Leave detected: {addr}", flush=True)
-                    event.clear()
-
-            # Handle subnet monitoring (new mode)
-            if self.subnets:
-                current_joined = get_igmp_joined_groups(self.subnets)
+        timer_fd = os.timerfd_create(time.CLOCK_MONOTONIC, flags=os.TFD_CLOEXEC)
+        os.timerfd_settime(timer_fd, initial=IGMP_POLL_INTERVAL, interval=IGMP_POLL_INTERVAL)
+        poller = select.epoll()
+        poller.register(timer_fd, select.EPOLLIN)
+        poller.register(self._wakeup_fd, select.EPOLLIN)
 
-                with self._lock:
-                    # Detect new joins
-                    new_joins = current_joined - self._active_groups
-                    for addr in new_joins:
-                        print(f"IGMP Join detected: {addr}", flush=True)
-                        if self.on_join:
-                            self.on_join(addr)
-
-                    # Detect leaves
-                    leaves = self._active_groups - current_joined
-                    for addr in leaves:
-                        print(f"IGMP Leave detected: {addr}", flush=True)
-                        if self.on_leave:
-                            self.on_leave(addr)
+        try:
+            while self.running:
+                self._poll()
+                for fd, _ in poller.poll():
+                    if fd == timer_fd:
+                        # Drain the expiration count; missed ticks are coalesced
+                        os.read(timer_fd, 8)
+        finally:
+            poller.close()
+            os.close(timer_fd)
+
+    def _poll(self) -> None:
+        # One read and parse per poll serves every group and subnet
+        joined_groups = parse_igmp_groups(read_proc_igmp())
+
+        # Handle fixed groups (legacy mode)
+        for addr, event in self.groups.items():
+            is_joined = self._group_targets[addr] in joined_groups
+
+            if is_joined and not event.is_set():
+                print(f"IGMP Join detected: {addr}", flush=True)
+                event.set()
+                self.changes += 1
+            elif not is_joined and event.is_set():
+                print(f"IGMP Leave detected: {addr}", flush=True)
+                event.clear()
+                self.changes += 1
+
+        # Handle subnet monitoring (new mode)
+        if self.subnets:
+            current_joined = get_igmp_joined_groups(self._subnet_masks, joined_groups)
 
-                    self._active_groups = current_joined
+            with self._lock:
+                # Detect new joins
+                new_joins = current_joined - self._active_groups
+                for addr in new_joins:
+                    print(f"IGMP Join detected: {addr}", flush=True)
+                    if self.on_join:
+                        self.on_join(addr)
 
-            time.sleep(0.05)  # Poll every 50ms for faster response
+                # Detect leaves
+                leaves = self._active_groups - current_joined
+                for addr in leaves:
+                    print(f"IGMP Leave detected: {addr}", flush=True)
+                    if self.on_leave:
+                        self.on_leave(addr)
+
+                self._active_groups = current_joined
+                if new_joins or leaves:
+                    self.changes += 1
+
+        # Flip the aggregate event only on empty <-> non-empty transitions
+        any_joined = bool(self._active_groups) or any(event.is_set() for event in self.groups.values())
+        if any_joined != self.any_joined.is_set():
+            if any_joined:
+                self.any_joined.set()
+            else:
+                self.any_joined.clear()
 
     def get_active_groups(self) -> set[str]:
         """Return currently active (joined) groups."""
@@ -372,11 +1017,65 @@ class IGMPMonitor(Thread):
             return self._active_groups.copy()
 
     def stop(self) -> None:
+        if self._wakeup_fd < 0:
+            return
         self.running = False
+        os.eventfd_write(self._wakeup_fd, 1)
+        if self.is_alive():
+            self.join(1.0)
+        os.close(self._wakeup_fd)
+        self._wakeup_fd = -1
+
+
+# Real-time scheduling for --rt (Linux)
+RT_PRIORITY = 50
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def enable_realtime(cpu: int) -> int:
+    """Run the calling thread under SCHED_FIFO, pinned to one CPU, with memory locked.
+
+    A negative cpu picks the highest CPU the process may run on. Threads
+    started earlier, such as the IGMP monitor, keep their own scheduling.
+    Returns the chosen CPU; raises OSError when not on Linux or without
+    CAP_SYS_NICE / CAP_IPC_LOCK (or a large enough RLIMIT_MEMLOCK).
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("--rt is only supported on Linux")
+
+    if cpu < 0:
+        cpu = max(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cpu})
+    os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(RT_PRIORITY))
+
+    # Keep the packet arena and stacks resident so page faults cannot stall sends
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, f"mlockall: {os.strerror(err)}")
+    return cpu
+
+
+PACING_SPIN_NS = 500_000  # With --rt, busy-wait the last 0.5ms before a deadline
+BATCH_WINDOW_NS = 1_000_000  # Packets due within 1ms go out with the current batch
+
+
+def random_mask(count: int, rate: float) -> bytearray:
+    """Return a mask with each of ``count`` entries set with probability ``rate`` percent.
+
+    Draws the number of hits from a binomial distribution and then picks that
+    many positions, which costs O(hits) random calls instead of O(count).
+    """
+    mask = bytearray(count)
+    if rate > 0:
+        for idx in random.sample(range(count), random.binomialvariate(count, min(rate, 100.0) / 100)):
+            mask[idx] = 1
+    return mask
 
 
 def replay_loop(
-    packets: list[PacketInfo],
+    packets: PacketTable,
     sock: socket.socket,
     group_events: dict[str, Event] | None = None,
     igmp_monitor: IGMPMonitor | None = None,
@@ -386,10 +1085,16 @@ def replay_loop(
     speed: float = 1.0,
     continuous: bool = False,
     verbose: bool = False,
+    gso: bool = True,
+    txtime: bool = False,
+    zerocopy: bool = False,
+    spin: bool = False,
 ) -> None:
     """Continuously replay packets when IGMP join is active.
 
-    Optimized for maximum throughput with minimal overhead.
+    Optimized for maximum throughput with minimal overhead. With ``spin``, the
+    last PACING_SPIN_NS before each deadline are busy-waited for tighter
+    timing, which keeps a CPU busy; meant for a dedicated CPU under --rt.
     """
     if not packets:
         print("No packets to replay")
@@ -404,28 +1109,35 @@ def replay_loop(
     total_bytes_sent = 0
     start_time = time.monotonic()
 
-    # Pre-calculate relative timestamps for speed adjustment
-    base_ts = packets[0].timestamp
-    relative_times = tuple((p.timestamp - base_ts) / speed for p in packets)
-
-    # Pre-extract payload, address and port for faster access
-    packet_data = tuple((p.payload, p.dst_addr, p.dst_port) for p in packets)
-    num_packets = len(packets)
-
-    # For continuous mode: track RTP sequence offset per stream (by dest port)
-    stream_seq_offsets: dict[int, int] = {}
-    stream_rtp_counts: dict[int, int] = {}
-    for payload, _dst_addr, port in packet_data:
-        if is_rtp_packet(payload):
-            stream_rtp_counts[port] = stream_rtp_counts.get(port, 0) + 1
-            if port not in stream_seq_offsets:
-                stream_seq_offsets[port] = 0
+    # Bind the flat arrays to locals so the hot loop indexes them directly
+    table = packets
+    arena = table.arena
+    offsets = table.offsets
+    lengths = table.lengths
+    ports = table.ports
+    dest_idx = table.dest_idx
+    num_packets = len(table)
+
+    # Pre-calculate relative timestamps for speed adjustment, as integer
+    # nanoseconds so the pacing math stays exact and allocation-free
+    base_ts = table.timestamps[0]
+    relative_times = array("q", (round((ts - base_ts) / speed * 1e9) for ts in table.timestamps))
+
+    # For continuous mode: track RTP sequence offset per stream (by dest port).
+    # The RTP packets of each stream were indexed at load time, so every loop
+    # rewrites the arena in one pass before sending.
+    stream_rtp_packets = table.rtp_streams
+    stream_seq_offsets = dict.fromkeys(stream_rtp_packets, 0)
 
     # Get unique ports from pcap
-    pcap_ports = set(p.dst_port for p in packets)
+    pcap_ports = set(port for _addr, port in table.dests)
+
+    pcap_dests = set(table.dests)
+    pcap_addrs = set(addr for addr, _port in table.dests)
 
-    pcap_dests = set((p.dst_addr, p.dst_port) for p in packets)
-    pcap_addrs = set(p.dst_addr for p in packets)
+    # Direct mode sends each packet to its captured destination only
+    direct_targets = [[(dest, sockaddr)] for dest, sockaddr in zip(table.dests, table.sockaddrs)]
+    sockaddr_cache: dict[tuple[str, int], bytes] = dict(zip(table.dests, table.sockaddrs))
 
     if direct:
         dest_str = ", ".join(f"{addr}:{port}" for addr, port in sorted(pcap_dests))
@@ -461,17 +1173,37 @@ def replay_loop(
     # Periodic stats tracking
     stats_interval = 5.0
     last_stats_time = time.monotonic()
-    interval_packets = 0
-    interval_bytes = 0
+    # Totals at the last stats output, so the hot loop only updates the totals
+    stats_packets = 0
+    stats_bytes = 0
 
     # Track current targets
     current_targets: set[str] = set()
 
-    # Cache function references for speed
+    # Cache function references for speed. Datagrams are queued and flushed
+    # with sendmmsg() whenever the loop is about to sleep or the batch fills.
     monotonic = time.monotonic
+    monotonic_ns = time.monotonic_ns
     sleep = time.sleep
-    sendto = sock.sendto
-    random_fn = random.random
+    sender = BatchSender(sock, arena, gso=gso, txtime=txtime, zerocopy=zerocopy)
+    send = sender.queue
+    flush = sender.flush
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    # With SO_TXTIME the qdisc releases each datagram at its transmit time, so
+    # datagrams are handed over ahead of time and the wait needs no spinning
+    send_lead = TXTIME_LEAD_NS if txtime else 0
+    spin_ns = PACING_SPIN_NS if spin and not txtime else 0
+
+    def wait_until(deadline: int, remaining: int) -> None:
+        # Sleep for the bulk of the wait. sleep() wakeups overshoot by tens of
+        # microseconds, so when spinning, busy-wait through the tail instead
+        if remaining > spin_ns:
+            sleep((remaining - spin_ns) / 1e9)
+        if spin_ns:
+            while monotonic_ns() < deadline:
+                pass
 
     # Always use timing for bandwidth/speed control
     # Timing is essential for controlled replay at specific speeds
@@ -483,15 +1215,57 @@ def replay_loop(
             return igmp_monitor.get_active_groups()
         return {addr for addr, event in group_events.items() if event.is_set()}
 
+    def membership_version() -> int:
+        # Without a monitor nothing reports changes, so targets are always re-read
+        return igmp_monitor.changes if igmp_monitor else monotonic_ns()
+
+    # Per-port (destination, sockaddr) fan-out lists. They are updated in
+    # place when targets change, so per-packet references below stay valid.
+    # Packets held for reordering take a snapshot of their targets instead.
+    fanout: dict[int, list[tuple[tuple[str, int], bytes]]] = {port: [] for port in pcap_ports}
+    fanout_targets: set[str] = set()
+
+    def update_fanout(targets: set[str]) -> None:
+        nonlocal fanout_targets
+        fanout_targets = targets
+        for port, pairs in fanout.items():
+            new_pairs = []
+            for addr in targets:
+                dest = (addr, port)
+                sockaddr = sockaddr_cache.get(dest)
+                if sockaddr is None:
+                    sockaddr = sockaddr_cache[dest] = pack_sockaddr_in(addr, port)
+                new_pairs.append((dest, sockaddr))
+            pairs[:] = new_pairs
+
+    # Resolve each packet's target list once for the whole run, specializing
+    # away the direct/fan-out choice from the hot loops
+    if direct:
+        packet_targets = [direct_targets[idx] for idx in dest_idx]
+        target_refresh_interval = num_packets  # Direct targets never change
+    else:
+        packet_targets = [fanout[port] for port in ports]
+        target_refresh_interval = 500  # Refresh targets every 500 packets
+
+    # Loss/reorder simulation is one branch in the shared send loop
+    simulate = loss_rate > 0 or reorder_rate > 0
+    loss_mask = reorder_mask = bytearray()
+
     try:
         while True:
+            seen_version = membership_version()
             targets = get_target_addresses()
 
             if not targets:
                 if current_targets:
                     print("All groups left, waiting for Join...", flush=True)
                     current_targets.clear()
-                sleep(0.1)
+                if igmp_monitor:
+                    # Woken by the monitor as soon as a Join is detected; the
+                    # timeout keeps Ctrl+C responsive
+                    igmp_monitor.any_joined.wait(1.0)
+                else:
+                    sleep(0.1)
                 continue
 
             # Log new targets
@@ -501,9 +1275,17 @@ def replay_loop(
                     print(f"Adding target: {addr}", flush=True)
             current_targets = targets.copy()
 
+            # Continue RTP sequence numbers from the previous loop, once the
+            # kernel no longer reads the arena for zerocopy sends
+            if continuous:
+                sender.wait_zerocopy()
+                for port, (rtp_offsets, rtp_seqs) in stream_rtp_packets.items():
+                    if stream_seq_offsets[port]:
+                        patch_rtp_sequences(arena, rtp_offsets, rtp_seqs, stream_seq_offsets[port])
+
             loop_count += 1
-            loop_start = monotonic()
-            packets_this_loop = 0
+            loop_start = monotonic_ns()
+            loop_start_packets = total_packets_sent
             dropped_this_loop = 0
             reordered_this_loop = 0
 
@@ -513,178 +1295,93 @@ def replay_loop(
                     flush=True,
                 )
 
-            # Convert targets to list for faster iteration
-            target_list = list(targets)
-            target_count = len(target_list)
-
-            # Pre-build destination tuples for each target and port
-            # This avoids tuple creation in the hot loop
-            dest_cache: dict[tuple[str, int], tuple[str, int]] = {}
-            for addr in target_list:
-                for port in pcap_ports:
-                    dest_cache[(addr, port)] = (addr, port)
+            # Pre-build (destination, sockaddr) pairs for each target and port
+            # This avoids tuple creation and address packing in the hot loop
+            target_count = len(targets)
+            update_fanout(targets)
 
-            # Reorder buffer for packet reordering simulation
-            reorder_buffer: list[tuple[bytes, int, float, list[str]]] = []
+            # Reorder buffer for packet reordering simulation: a min-heap of
+            # (release_ns, sequence, offset, length, targets); the sequence breaks ties
+            reorder_buffer: list[tuple[int, int, int, int, tuple[tuple[tuple[str, int], bytes], ...]]] = []
 
             i = 0
-            next_target_refresh = 500  # Refresh targets every 500 packets
-
-            # Check if we need loss/reorder simulation
-            use_loss = loss_rate > 0 and random_fn is not None
-            use_reorder = reorder_rate > 0 and random_fn is not None
-
-            # Fast path: no loss/reorder simulation
-            if not use_loss and not use_reorder:
-                while i < num_packets:
-                    # Refresh targets periodically
-                    if not direct and i >= next_target_refresh:
-                        targets = get_target_addresses()
-                        if not targets:
-                            break
-                        target_list = list(targets)
-                        target_count = len(target_list)
-                        next_target_refresh = i + 500
-
-                    payload, dst_addr, port = packet_data[i]
-                    send_targets = [dst_addr] if direct else target_list
-                    send_target_count = 1 if direct else target_count
-
-                    # Timing: single monotonic() call, sleep handles the wait
-                    target_time = loop_start + relative_times[i]
-                    wait_time = target_time - monotonic()
-                    if wait_time > 0.001:
-                        sleep(wait_time)
-
-                    # Patch RTP sequence number in continuous mode
-                    if continuous and port in stream_seq_offsets:
-                        offset = stream_seq_offsets[port]
-                        if offset > 0:
-                            payload = patch_rtp_sequence(payload, offset)
-
-                    # Send to all targets - unrolled for common cases
-                    payload_len = len(payload)
-                    if send_target_count == 1:
-                        sendto(payload, (send_targets[0], port))
-                        total_packets_sent += 1
-                        total_bytes_sent += payload_len
-                        packets_this_loop += 1
-                        interval_packets += 1
-                        interval_bytes += payload_len
-                    elif send_target_count == 2:
-                        sendto(payload, (send_targets[0], port))
-                        sendto(payload, (send_targets[1], port))
-                        total_packets_sent += 2
-                        total_bytes_sent += payload_len * 2
-                        packets_this_loop += 2
-                        interval_packets += 2
-                        interval_bytes += payload_len * 2
-                    else:
-                        for target_addr in send_targets:
-                            sendto(payload, (target_addr, port))
-                        total_packets_sent += send_target_count
-                        total_bytes_sent += payload_len * send_target_count
-                        packets_this_loop += send_target_count
-                        interval_packets += send_target_count
-                        interval_bytes += payload_len * send_target_count
-
-                    i += 1
-            else:
-                # Slow path: with loss/reorder simulation
-                while i < num_packets:
-                    # Refresh targets periodically
-                    if not direct and i >= next_target_refresh:
+            next_target_refresh = target_refresh_interval
+
+            # Loss/reorder decisions are drawn up front for the whole loop
+            # instead of per packet
+            if simulate:
+                loss_mask = random_mask(num_packets, loss_rate)
+                reorder_mask = random_mask(num_packets, reorder_rate)
+
+            while i < num_packets:
+                # Refresh targets periodically
+                if i >= next_target_refresh:
+                    version = membership_version()
+                    if version != seen_version:
+                        seen_version = version
                         targets = get_target_addresses()
                         if not targets:
                             break
-                        target_list = list(targets)
-                        target_count = len(target_list)
-                        next_target_refresh = i + 500
-
-                    payload, dst_addr, port = packet_data[i]
-                    send_targets = [dst_addr] if direct else target_list
-                    send_target_count = 1 if direct else target_count
-
-                    # Timing control
-                    target_time = loop_start + relative_times[i]
-                    now = monotonic()
-                    wait_time = target_time - now
-
-                    if wait_time > 0.001:
-                        sleep(wait_time)
-                        now = target_time  # Assume sleep was accurate enough
-
-                    # Process reorder buffer
-                    if reorder_buffer:
-                        j = 0
-                        while j < len(reorder_buffer):
-                            buf_payload, buf_port, buf_time, buf_targets = reorder_buffer[j]
-                            if now >= buf_time:
-                                for dst_addr in buf_targets:
-                                    sendto(buf_payload, (dst_addr, buf_port))
-                                    total_packets_sent += 1
-                                    total_bytes_sent += len(buf_payload)
-                                    packets_this_loop += 1
-                                reorder_buffer.pop(j)
-                            else:
-                                j += 1
+                        if targets != fanout_targets:
+                            target_count = len(targets)
+                            update_fanout(targets)
+                    next_target_refresh = i + target_refresh_interval
+
+                offset = offsets[i]
+                send_targets = packet_targets[i]
+
+                # Timing: packets due within the batch window go out together;
+                # now is the send horizon, ahead of the clock by the SO_TXTIME lead
+                target_time = loop_start + relative_times[i]
+                now = monotonic_ns() + send_lead
+                wait_time = target_time - now
+                if wait_time > BATCH_WINDOW_NS:
+                    flush()
+                    wait_until(target_time - send_lead, wait_time)
+                    now = target_time
+
+                if simulate:
+                    # Release reordered packets that are due
+                    while reorder_buffer and reorder_buffer[0][0] <= now:
+                        release_time, _, buf_offset, buf_len, buf_targets = heappop(reorder_buffer)
+                        for dest, sockaddr in buf_targets:
+                            send(buf_offset, buf_len, dest, sockaddr, release_time)
+                        total_packets_sent += len(buf_targets)
+                        total_bytes_sent += buf_len * len(buf_targets)
 
                     # Simulate packet loss
-                    if use_loss and random_fn() * 100 < loss_rate:
+                    if loss_mask[i]:
                         dropped_this_loop += 1
                         total_packets_dropped += 1
                         i += 1
                         continue
 
                     # Simulate packet reordering
-                    if use_reorder and random_fn() * 100 < reorder_rate:
-                        delay_time = random.uniform(0.001, 0.01)
-                        reorder_buffer.append((payload, port, now + delay_time, send_targets.copy()))
+                    if reorder_mask[i]:
+                        delay_time = random.randrange(1_000_000, 10_000_000)  # 1-10ms
+                        heappush(reorder_buffer, (now + delay_time, i, offset, lengths[i], tuple(send_targets)))
                         reordered_this_loop += 1
                         total_packets_reordered += 1
                         i += 1
                         continue
 
-                    # Patch RTP sequence number in continuous mode
-                    if continuous and port in stream_seq_offsets:
-                        offset = stream_seq_offsets[port]
-                        if offset > 0:
-                            payload = patch_rtp_sequence(payload, offset)
-
-                    # Send to all targets
-                    payload_len = len(payload)
-                    if send_target_count == 1:
-                        sendto(payload, (send_targets[0], port))
-                        total_packets_sent += 1
-                        total_bytes_sent += payload_len
-                        packets_this_loop += 1
-                        interval_packets += 1
-                        interval_bytes += payload_len
-                    elif send_target_count == 2:
-                        sendto(payload, (send_targets[0], port))
-                        sendto(payload, (send_targets[1], port))
-                        total_packets_sent += 2
-                        total_bytes_sent += payload_len * 2
-                        packets_this_loop += 2
-                        interval_packets += 2
-                        interval_bytes += payload_len * 2
-                    else:
-                        for target_addr in send_targets:
-                            sendto(payload, (target_addr, port))
-                        total_packets_sent += send_target_count
-                        total_bytes_sent += payload_len * send_target_count
-                        packets_this_loop += send_target_count
-                        interval_packets += send_target_count
-                        interval_bytes += payload_len * send_target_count
+                # Send to all targets
+                payload_len = lengths[i]
+                for dest, sockaddr in send_targets:
+                    send(offset, payload_len, dest, sockaddr, target_time)
+                total_packets_sent += len(send_targets)
+                total_bytes_sent += payload_len * len(send_targets)
 
-                    i += 1
+                i += 1
+
+            flush()
 
             # Stats output at end of each loop (time-based, every stats_interval)
             now = monotonic()
             if now - last_stats_time >= stats_interval:
                 elapsed_interval = now - last_stats_time
-                pkt_rate = interval_packets / elapsed_interval
-                byte_rate = interval_bytes / elapsed_interval
+                pkt_rate = (total_packets_sent - stats_packets) / elapsed_interval
+                byte_rate = (total_bytes_sent - stats_bytes) / elapsed_interval
                 print(
                     f"[Stats] {target_count} target(s), {pkt_rate:.1f} pkt/s, "
                     f"{byte_rate / 1024 / 1024:.2f} MB/s, "
@@ -692,18 +1389,21 @@ def replay_loop(
                     flush=True,
                 )
                 last_stats_time = now
-                interval_packets = 0
-                interval_bytes = 0
+                stats_packets = total_packets_sent
+                stats_bytes = total_bytes_sent
 
             # Flush remaining reorder buffer
-            for buf_payload, buf_port, _, buf_targets in reorder_buffer:
-                for dst_addr in buf_targets:
-                    sendto(buf_payload, (dst_addr, buf_port))
-                    total_packets_sent += 1
-                    total_bytes_sent += len(buf_payload)
-                    packets_this_loop += 1
+            while reorder_buffer:
+                release_time, _, buf_offset, buf_len, buf_targets = heappop(reorder_buffer)
+                for dest, sockaddr in buf_targets:
+                    send(buf_offset, buf_len, dest, sockaddr, release_time)
+                total_packets_sent += len(buf_targets)
+                total_bytes_sent += buf_len * len(buf_targets)
+            flush()
+
+            packets_this_loop = total_packets_sent - loop_start_packets
 
-            loop_duration = monotonic() - loop_start
+            loop_duration = (monotonic_ns() - loop_start) / 1e9
 
             if verbose and packets_this_loop > 0:
                 stats = f"Loop {loop_count}: {packets_this_loop} packets"
@@ -716,8 +1416,8 @@ def replay_loop(
                 print(stats, flush=True)
 
             if continuous:
-                for port, count in stream_rtp_counts.items():
-                    stream_seq_offsets[port] += count
+                for port, (_, rtp_seqs) in stream_rtp_packets.items():
+                    stream_seq_offsets[port] += len(rtp_seqs)
             else:
                 if verbose:
                     print("Waiting 3s before next loop...", flush=True)
@@ -734,6 +1434,11 @@ def replay_loop(
     )
     if total_packets_dropped > 0:
         print(f"Dropped: {total_packets_dropped} packets", flush=True)
+    if sender.backpressure_waits > 0 or sender.dropped > 0:
+        print(
+            f"Send buffer full: waited {sender.backpressure_waits} time(s), {sender.dropped} packets dropped",
+            flush=True,
+        )
     if total_packets_reordered > 0:
         print(f"Reordered: {total_packets_reordered} packets", flush=True)
     if elapsed > 0:
@@ -775,7 +1480,7 @@ def main() -> int:
 
     # Calculate subnets to monitor based on destination addresses in pcap
     # Each unique destination IP gets its corresponding /24 subnet monitored
-    pcap_addrs = set(p.dst_addr for p in packets)
+    pcap_addrs = set(addr for addr, _port in packets.dests)
     subnets = sorted(set(get_subnet_for_ip(addr) for addr in pcap_addrs))
 
     igmp_available = Path("/proc/net/igmp").is_file()
@@ -800,11 +1505,20 @@ def main() -> int:
         igmp_monitor.start()
 
     try:
-        sock = create_multicast_socket(args.interface)
+        sock = create_multicast_socket(args.interface, txtime=args.txtime, zerocopy=args.zerocopy)
     except OSError as e:
         print(f"Error creating socket: {e}", file=sys.stderr)
         return 1
 
+    if args.rt is not None:
+        # After the IGMP monitor starts, so only the replay thread is pinned
+        try:
+            cpu = enable_realtime(args.rt)
+        except OSError as e:
+            print(f"Error enabling real-time scheduling: {e}", file=sys.stderr)
+            return 1
+        print(f"Real-time scheduling: SCHED_FIFO priority {RT_PRIORITY} on CPU {cpu}", flush=True)
+
     try:
         replay_loop(
             packets,
@@ -816,6 +1530,10 @@ def main() -> int:
             speed=args.speed,
             continuous=args.continuous,
             verbose=args.verbose,
+            gso=not args.no_gso,
+            txtime=args.txtime,
+            zerocopy=args.zerocopy,
+            spin=args.rt is not None,
         )
     finally:
         if igmp_monitor: